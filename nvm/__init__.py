@@ -1,2 +1 @@
-__author__ = 'Christian S. Perone <christian.perone@gmail.com>'
-__version__ = '0.2'
\ No newline at end of file
+from nvm._version import __author__, __version__
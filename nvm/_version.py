@@ -0,0 +1,6 @@
+"""Package version and authorship, kept importable without loading the
+compiled `_pmem` extension so `setup.py` can read it by parsing this
+file at build time."""
+
+__author__ = 'Christian S. Perone <christian.perone@gmail.com>'
+__version__ = '0.2'
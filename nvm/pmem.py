@@ -23,38 +23,136 @@ FILE_SPARSE = 4
 #: Create a mapping for an unnamed temporary file.
 FILE_TMPFILE = 8
 
+# Bind the hot library entry points once at import time; going through
+# the lib object repeats a __getattr__ probe on every call.
+_persist = lib.px_persist
+_flush = lib.px_flush
+_drain = lib.px_drain
+_flush_drain = lib.pmem_flush_drain
+_msync = lib.pmem_msync
+_is_pmem = lib.pmem_is_pmem
+_unmap = lib.pmem_unmap
+_memcpy_persist = lib.pmem_memcpy_persist
+_memset_persist = lib.pmem_memset_persist
+
 
 class MemoryBuffer(object):
     """A file-like I/O (similar to cStringIO) for persistent mmap'd regions."""
 
+    __slots__ = ('buffer', 'is_pmem', 'mapped_len', 'size', 'pos',
+                 '_cdata_ptr', '_size', '_dirty_lo', '_dirty_hi')
+
     def __init__(self, buffer_, is_pmem, mapped_len):
         self.buffer = buffer_
         self.is_pmem = is_pmem
         self.mapped_len = mapped_len
         self.size = len(buffer_)
         self.pos = 0
+        # Cache the cdata pointer and length once, so the persistence
+        # helpers don't pay an ffi.from_buffer() on every call.
+        self._cdata_ptr = ffi.from_buffer(buffer_)
+        self._size = self.size
+        # Dirty range written through write(), so the exit path only
+        # persists what actually changed instead of the whole mapping.
+        self._dirty_lo = self._size
+        self._dirty_hi = 0
 
     def __len__(self):
         return self.size
 
     def _cdata(self):
-        return ffi.from_buffer(self.buffer)
+        return self._cdata_ptr
 
     def write(self, data):
         """Write data into the buffer.
 
         :param data: data to write into the buffer.
         """
-        if not data:
-            return
+        ldata = len(data)
+        new_pos = self.pos + ldata
+        if new_pos > self._size:
+            raise RuntimeError("Out of range error.")
+        # A plain memcpy through libc, instead of the slice-assignment
+        # path through CPython's buffer protocol.
+        ffi.memmove(ffi.cast("char *", self._cdata_ptr) + self.pos,
+                    data, ldata)
+        if self.pos < self._dirty_lo:
+            self._dirty_lo = self.pos
+        if new_pos > self._dirty_hi:
+            self._dirty_hi = new_pos
+        self.pos = new_pos
+
+    def write_persist(self, data):
+        """Write data into the buffer and make it persistent in a single
+        step, using the library's optimized `pmem_memcpy_persist()`. On
+        hardware with non-temporal stores the data bypasses the
+        processor cache, so no separate flush pass over the written
+        range is needed afterwards.
 
+        :param data: data to write into the buffer.
+        """
         ldata = len(data)
-        if (ldata + self.pos) > self.size:
+        if (self.pos + ldata) > self._size:
             raise RuntimeError("Out of range error.")
 
-        new_pos = self.pos + ldata
-        self.buffer[self.pos:new_pos] = data
-        self.pos = new_pos
+        dest = ffi.cast("char *", self._cdata_ptr) + self.pos
+        _memcpy_persist(dest, ffi.from_buffer(data), ldata)
+        self.pos += ldata
+
+    def memset(self, value, offset=0, length=None):
+        """Fill a range of the buffer with a byte value and make it
+        persistent, using the library's optimized `pmem_memset_persist()`.
+        This avoids materializing the fill pattern in Python and, on
+        hardware with non-temporal stores, skips the cache-flush pass a
+        plain write-then-persist would need.
+
+        :param value: the byte value to fill the range with.
+        :param offset: byte offset where the fill starts (default 0).
+        :param length: length of the range in bytes, defaults to the
+                       rest of the buffer.
+        """
+        if length is None:
+            length = self._size - offset
+        if (offset < 0 or length < 0 or offset > self._size or
+                (offset + length) > self._size):
+            raise RuntimeError("Out of range error.")
+        _memset_persist(ffi.cast("char *", self._cdata_ptr) + offset,
+                        value, length)
+
+    def write_buffered(self, data):
+        """Write data into the buffer without persisting it. The write
+        is only accumulated into the pending dirty range; call
+        :func:`flush_pending` (or leave a :func:`batch` block) to make
+        all pending writes persistent under a single persist.
+
+        :param data: data to write into the buffer.
+        """
+        self.write(data)
+
+    def flush_pending(self):
+        """Persist the accumulated dirty range in a single call. Writes
+        coalesced this way pay one store barrier per batch instead of
+        one per write. Does nothing when there is no pending data.
+        """
+        lo, hi = self._dirty_lo, self._dirty_hi
+        if hi > lo:
+            if self.is_pmem:
+                persist_range(self, lo, hi - lo)
+            else:
+                msync_range(self, lo, hi - lo)
+            self._dirty_lo = self._size
+            self._dirty_hi = 0
+
+    def batch(self):
+        """Returns a context manager that defers persistence for all
+        writes made inside the block and issues a single persist over
+        the union of the dirty ranges on exit::
+
+            with memory_buffer.batch():
+                memory_buffer.write(header)
+                memory_buffer.write(payload)
+        """
+        return BatchContext(self)
 
     def read(self, size=0):
         """Read data from the buffer.
@@ -63,26 +161,47 @@ class MemoryBuffer(object):
         :return: data read.
         """
         if size <= 0:
-            if self.pos >= self.size:
+            if self.pos >= self._size:
                 raise EOFError("End of file.")
-            data = self.buffer[self.pos:self.size]
-            self.pos = self.size
+            data = self.buffer[self.pos:self._size]
+            self.pos = self._size
             return data
-        else:
-            if (self.pos + size) > self.size:
-                raise RuntimeError("Out of range error.")
-            data = self.buffer[self.pos:self.pos + size]
-            self.pos += size
+        new_pos = self.pos + size
+        if new_pos > self._size:
+            raise RuntimeError("Out of range error.")
+        data = self.buffer[self.pos:new_pos]
+        self.pos = new_pos
+        return data
+
+    def read_view(self, size=0):
+        """Read data from the buffer as a zero-copy `memoryview` over
+        the mapped region, advancing the cursor like :func:`read`. The
+        view stays valid while the mapping is alive, so consumers such
+        as `struct.unpack_from` or `numpy.frombuffer` can work on it
+        without any intermediate copy.
+
+        :param size: size to read, zero equals to entire buffer size.
+        :return: a memoryview over the data read.
+        """
+        if size <= 0:
+            if self.pos >= self._size:
+                raise EOFError("End of file.")
+            data = memoryview(self.buffer)[self.pos:self._size]
+            self.pos = self._size
             return data
+        new_pos = self.pos + size
+        if new_pos > self._size:
+            raise RuntimeError("Out of range error.")
+        data = memoryview(self.buffer)[self.pos:new_pos]
+        self.pos = new_pos
+        return data
 
     def seek(self, pos):
         """Moves the cursor position in the buffer.
 
         :param pos: the new cursor position
         """
-        if pos < 0:
-            raise RuntimeError("Negative position.")
-        if pos > self.size:
+        if not 0 <= pos <= self._size:
             raise RuntimeError("Out of range error.")
         self.pos = pos
 
@@ -91,10 +210,11 @@ class MemoryBuffer(object):
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if exc_type is None:
-            if is_pmem(self):
-                persist(self)
-            else:
-                msync(self)
+            # The pmem-ness of the mapping was classified once by
+            # map_file(); no need to re-query libpmem on every exit.
+            # Only the dirty range is made persistent, not the whole
+            # mapping.
+            self.flush_pending()
             unmap(self)
         return False
 
@@ -105,6 +225,9 @@ class FlushContext(object):
 
     :param memory_buffer: the MemoryBuffer object.
     """
+
+    __slots__ = ('memory_buffer', 'unmap')
+
     def __init__(self, memory_buffer, unmap=True):
         self.memory_buffer = memory_buffer
         self.unmap = unmap
@@ -121,11 +244,14 @@ class FlushContext(object):
 
 
 class DrainContext(object):
-    """A context manager that will automatically drain the
-    specified memory buffer.
+    """A context manager that will automatically flush and drain the
+    specified memory buffer upon exit.
 
     :param memory_buffer: the MemoryBuffer object.
     """
+
+    __slots__ = ('memory_buffer', 'unmap')
+
     def __init__(self, memory_buffer, unmap=True):
         self.memory_buffer = memory_buffer
         self.unmap = unmap
@@ -135,24 +261,57 @@ class DrainContext(object):
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if exc_type is None:
-            drain(self.memory_buffer)
+            flush_drain(self.memory_buffer)
             if self.unmap:
                 unmap(self.memory_buffer)
         return False
 
 
+class BatchContext(object):
+    """A context manager that defers persistence of writes made to the
+    specified memory buffer and persists the accumulated dirty range
+    with a single call upon exit.
+
+    :param memory_buffer: the MemoryBuffer object.
+    """
+
+    __slots__ = ('memory_buffer',)
+
+    def __init__(self, memory_buffer):
+        self.memory_buffer = memory_buffer
+
+    def __enter__(self):
+        return self.memory_buffer
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.memory_buffer.flush_pending()
+        return False
+
+
+#: Memoized results of successful version checks; the library's answer
+#: cannot change within a process.
+_version_cache = {}
+
+
 def check_version(major_required, minor_required):
     """Checks the libpmem version according to the specified major
-    and minor versions required.
+    and minor versions required. Successful checks are cached, so
+    repeated calls with the same versions don't cross into the library
+    again.
 
     :param major_required: Major version required.
     :param minor_required: Minor version required.
     :return: returns True if the nvm has the required version,
           or raises a RuntimeError exception in case of failure.
     """
+    key = (major_required, minor_required)
+    if key in _version_cache:
+        return _version_cache[key]
     ret = lib.pmem_check_version(major_required, minor_required)
     if ret != ffi.NULL:
         raise RuntimeError(ffi.string(ret))
+    _version_cache[key] = True
     return True
 
 
@@ -213,8 +372,7 @@ def unmap(memory_buffer):
 
     :param memory_buffer: the MemoryBuffer object.
     """
-    cdata = memory_buffer._cdata()
-    ret = lib.pmem_unmap(cdata, len(memory_buffer))
+    ret = _unmap(memory_buffer._cdata_ptr, memory_buffer._size)
 
     if ret:
         raise RuntimeError(os.strerror(ffi.errno))
@@ -227,29 +385,119 @@ def is_pmem(memory_buffer):
 
     :return: True if the entire range is persistent memory, False otherwise.
     """
-    cdata = memory_buffer._cdata()
-    ret = lib.pmem_is_pmem(cdata, len(memory_buffer))
+    ret = _is_pmem(memory_buffer._cdata_ptr, memory_buffer._size)
     return bool(ret)
 
 
 def persist(memory_buffer):
     """Make any cached changes to a range of pmem persistent.
 
+    .. note:: The GIL is released while the library call is in
+              progress, so multiple Python threads can persist
+              different regions concurrently.
+
+    .. note:: When the mapping was classified as non-pmem by
+              :func:`~nvm.pmem.map_file`, this falls back to
+              :func:`~nvm.pmem.msync`, which is what the cache-flush
+              path would degenerate to anyway.
+
+    :param memory_buffer: the MemoryBuffer object.
+    """
+    if memory_buffer.is_pmem:
+        _persist(memory_buffer._cdata_ptr, memory_buffer._size)
+    else:
+        msync(memory_buffer)
+
+
+def deep_persist(memory_buffer):
+    """Make any cached changes to a range of pmem persistent all the
+    way to the most reliable persistence domain available (e.g. flushed
+    from any platform buffers, not only the CPU caches). Stronger and
+    slower than :func:`~nvm.pmem.persist`.
+
+    :param memory_buffer: the MemoryBuffer object.
+    :return: zero on success, an exception will rise in case of error.
+    """
+    ret = lib.pmem_deep_persist(memory_buffer._cdata_ptr,
+                                memory_buffer._size)
+    if ret:
+        raise RuntimeError(os.strerror(ffi.errno))
+    return ret
+
+
+def deep_flush(memory_buffer):
+    """Flush the given memory region towards the most reliable
+    persistence domain, without the trailing drain. Pair with
+    :func:`~nvm.pmem.drain` for the full deep-persist semantics.
+
+    :param memory_buffer: the MemoryBuffer object.
+    """
+    lib.pmem_deep_flush(memory_buffer._cdata_ptr, memory_buffer._size)
+
+
+def _check_range(memory_buffer, offset, length):
+    # Guard the pointer arithmetic below: an out-of-bounds range would
+    # flush unmapped memory and can take the interpreter down.
+    if (offset < 0 or length < 0 or offset > memory_buffer._size or
+            (offset + length) > memory_buffer._size):
+        raise RuntimeError("Out of range error.")
+
+
+def persist_range(memory_buffer, offset, length):
+    """Make any cached changes to a sub-range of pmem persistent.
+    Persistence cost is proportional to the number of cachelines
+    flushed, so after a small write this is much cheaper than
+    persisting the whole mapping.
+
+    :param memory_buffer: the MemoryBuffer object.
+    :param offset: byte offset of the range inside the mapping.
+    :param length: length of the range in bytes.
+    """
+    _check_range(memory_buffer, offset, length)
+    _persist(ffi.cast("char *", memory_buffer._cdata_ptr) + offset, length)
+
+
+def flush_range(memory_buffer, offset, length):
+    """Flush processor cache for a sub-range of the given memory region.
+
+    :param memory_buffer: the MemoryBuffer object.
+    :param offset: byte offset of the range inside the mapping.
+    :param length: length of the range in bytes.
+    """
+    _check_range(memory_buffer, offset, length)
+    _flush(ffi.cast("char *", memory_buffer._cdata_ptr) + offset, length)
+
+
+def msync_range(memory_buffer, offset, length):
+    """Flush a sub-range of the mapping to persistence via `msync()`.
+    The range is expanded internally to page boundaries as required by
+    the syscall.
+
     :param memory_buffer: the MemoryBuffer object.
+    :param offset: byte offset of the range inside the mapping.
+    :param length: length of the range in bytes.
+    :return: the msync() return result, in case of msync() error,
+             an exception will rise.
     """
-    cdata = memory_buffer._cdata()
-    lib.pmem_persist(cdata, len(memory_buffer))
+    _check_range(memory_buffer, offset, length)
+    ret = _msync(ffi.cast("char *", memory_buffer._cdata_ptr) + offset,
+                 length)
+    if ret:
+        raise RuntimeError(os.strerror(ffi.errno))
+    return ret
 
 
 def msync(memory_buffer):
     """Flush to persistence via `msync()`.
 
+    .. note:: The GIL is released for the duration of the syscall, so
+              other Python threads keep running while it blocks.
+
     :param memory_buffer: the MemoryBuffer object.
     :return: the msync() return result, in case of msync() error,
              an exception will rise.
     """
-    cdata = memory_buffer._cdata()
-    ret = lib.pmem_msync(cdata, len(memory_buffer))
+    ret = _msync(memory_buffer._cdata_ptr, memory_buffer._size)
     if ret:
         raise RuntimeError(os.strerror(ffi.errno))
     return ret
@@ -260,8 +508,7 @@ def flush(memory_buffer):
 
     :param memory_buffer: the MemoryBuffer object.
     """
-    cdata = memory_buffer._cdata()
-    lib.pmem_flush(cdata, len(memory_buffer))
+    _flush(memory_buffer._cdata_ptr, memory_buffer._size)
 
 
 def drain(memory_buffer):
@@ -269,5 +516,15 @@ def drain(memory_buffer):
 
     :param memory_buffer: the MemoryBuffer object.
     """
-    cdata = memory_buffer._cdata()
-    lib.pmem_flush(cdata, len(memory_buffer))
+    _drain()
+
+
+def flush_drain(memory_buffer):
+    """Flush processor cache for the given memory region and then wait
+    for the stores to drain, as a single fused call. This is equivalent
+    to calling :func:`~nvm.pmem.flush` followed by
+    :func:`~nvm.pmem.drain`, but crosses the FFI boundary only once.
+
+    :param memory_buffer: the MemoryBuffer object.
+    """
+    _flush_drain(memory_buffer._cdata_ptr, memory_buffer._size)
@@ -8,8 +8,19 @@
 .. seealso:: `NVML libpmemblk documentation <http://pmem.io/nvml/libpmemblk/libpmemblk.3.html>`_.
 """
 import os
+import sys
+import threading
 from _pmem import lib, ffi
 
+try:
+    _fsencode = os.fsencode
+except AttributeError:
+    # Python 2: filenames are usually bytes already.
+    def _fsencode(filename):
+        if isinstance(filename, bytes):
+            return filename
+        return filename.encode(sys.getfilesystemencoding() or 'utf-8')
+
 
 class BlockPool(object):
     """This class represents the Block Pool opened or created using
@@ -18,6 +29,17 @@ class BlockPool(object):
     def __init__(self, block_pool):
         self.block_pool = block_pool
         self.block_size = self.bsize()
+        # Reusable read buffers, allocated once per thread so read()
+        # doesn't pay a malloc/free round-trip per block. They must be
+        # per-thread: the GIL is released during pmemblk_read, so a
+        # single shared buffer would race between concurrent readers.
+        self._read_bufs = threading.local()
+
+    def _read_scratch(self):
+        buf = getattr(self._read_bufs, 'buf', None)
+        if buf is None:
+            buf = self._read_bufs.buf = ffi.new("char[]", self.block_size)
+        return buf
 
     def close(self):
         """This method closes the memory pool. The block memory pool itself
@@ -52,13 +74,74 @@ class BlockPool(object):
         .. note:: Reading a block that has never been written will return an
                   empty buffer.
 
-        :return: data at block.
+        .. note:: The GIL is released during the library call, so reads
+                  from different threads can proceed in parallel.
+
+        :return: data at block, always exactly block_size bytes. Blocks
+                 are binary-safe: embedded NUL bytes are preserved.
         """
-        data = ffi.new("char[]", self.block_size)
+        data = self._read_scratch()
         ret = lib.pmemblk_read(self.block_pool, data, block_num)
         if ret == -1:
-            raise RuntimeError(ffi.string(ret))
-        return ffi.string(data)
+            raise RuntimeError(os.strerror(ffi.errno))
+        return ffi.buffer(data, self.block_size)[:]
+
+    def read_into(self, block_num, out):
+        """This method reads a block from the memory pool directly into a
+        preallocated writable buffer (such as a `bytearray` or a writable
+        `memoryview`), avoiding the allocation of a new Python object
+        per read.
+
+        :param block_num: the block number to read.
+        :param out: a writable buffer of at least the pool block size.
+        """
+        data = self._read_scratch()
+        ret = lib.pmemblk_read(self.block_pool, data, block_num)
+        if ret == -1:
+            raise RuntimeError(os.strerror(ffi.errno))
+        ffi.memmove(out, data, self.block_size)
+        return ret
+
+    def read_many(self, block_nums):
+        """This method reads several blocks from the memory pool with a
+        single call into the library, iterating over the block numbers
+        in C instead of paying one FFI crossing per block.
+
+        :param block_nums: a sequence of block numbers to read.
+        :return: the concatenated data of all blocks, in the order the
+                 block numbers were given.
+        """
+        nblocks = len(block_nums)
+        blocks = ffi.new("off_t[]", list(block_nums))
+        data = ffi.new("char[]", self.block_size * nblocks)
+        ret = lib.pmemblk_read_many(self.block_pool, data, blocks, nblocks)
+        if ret == -1:
+            raise RuntimeError(os.strerror(ffi.errno))
+        return ffi.buffer(data, self.block_size * nblocks)[:]
+
+    def write_many(self, data, block_nums):
+        """This method writes several blocks to the memory pool with a
+        single call into the library. The data must be a contiguous
+        buffer of `len(block_nums) * block_size` bytes; each individual
+        block write keeps the usual atomicity guarantees, but the batch
+        as a whole is not atomic.
+
+        :param data: contiguous buffer holding one block per block number.
+        :param block_nums: a sequence of block numbers to write to.
+        :return: On success, zero is returned. On error, an exception
+                 will be raised.
+        """
+        nblocks = len(block_nums)
+        buf = ffi.from_buffer(data)
+        # Validate against the char[] view so the guard counts bytes
+        # even when len(data) would count multi-byte elements.
+        if len(buf) < self.block_size * nblocks:
+            raise RuntimeError("Out of range error.")
+        blocks = ffi.new("off_t[]", list(block_nums))
+        ret = lib.pmemblk_write_many(self.block_pool, buf, blocks, nblocks)
+        if ret == -1:
+            raise RuntimeError(os.strerror(ffi.errno))
+        return ret
 
     def write(self, data, block_num):
         """This method writes a block from data to block number blockno in the
@@ -67,10 +150,39 @@ class BlockPool(object):
         or system crash; on recovery the block is guaranteed to
         contain either the old data or the new data, never a mixture of both.
 
+        .. note:: The GIL is released during the library call, so writes
+                  from different threads can proceed in parallel.
+
         :return: On success, zero is returned. On error, an exception
                  will be raised.
         """
-        ret = lib.pmemblk_write(self.block_pool, data, block_num)
+        buf = ffi.from_buffer(data)
+        # The library always reads block_size bytes from the source;
+        # catch short buffers here instead of overreading them.
+        if len(buf) < self.block_size:
+            raise RuntimeError("Out of range error.")
+        ret = lib.pmemblk_write(self.block_pool, buf, block_num)
+        if ret == -1:
+            raise RuntimeError(os.strerror(ffi.errno))
+        return ret
+
+    def write_from_offset(self, data, offset, block_num):
+        """This method writes one block taken at the given byte offset of
+        a larger buffer, without slicing it in Python (which would copy).
+        The buffer must hold at least `offset + block_size` bytes. The
+        write keeps the same atomicity guarantees as
+        :func:`~nvm.pmemblk.BlockPool.write`.
+
+        :param data: buffer holding the block to write.
+        :param offset: byte offset of the block inside the buffer.
+        :param block_num: the block number to write to.
+        :return: On success, zero is returned. On error, an exception
+                 will be raised.
+        """
+        if (offset + self.block_size) > len(data):
+            raise RuntimeError("Out of range error.")
+        buf = ffi.cast("char *", ffi.from_buffer(data)) + offset
+        ret = lib.pmemblk_write(self.block_pool, buf, block_num)
         if ret == -1:
             raise RuntimeError(os.strerror(ffi.errno))
         return ret
@@ -120,7 +232,7 @@ def open(filename, block_size=0):
     :return: the block memory pool.
     :rtype: BlockPool
     """
-    ret = lib.pmemblk_open(filename, block_size)
+    ret = lib.pmemblk_open(_fsencode(filename), block_size)
     if ret == ffi.NULL:
         raise RuntimeError(os.strerror(ffi.errno))
     return BlockPool(ret)
@@ -146,7 +258,8 @@ def create(filename, block_size, pool_size=1024 * 1024 * 2, mode=0666):
     :return: the new block memory pool created.
     :rtype: BlockPool
     """
-    ret = lib.pmemblk_create(filename, block_size, pool_size, mode)
+    ret = lib.pmemblk_create(_fsencode(filename), block_size, pool_size,
+                             mode)
     if ret == ffi.NULL:
         raise RuntimeError(os.strerror(ffi.errno))
     return BlockPool(ret)
@@ -163,20 +276,29 @@ def check(filename, block_size=0):
 
     :return: True if memory pool is consistent, False otherwise.
     """
-    ret = lib.pmemblk_check(filename, block_size)
+    ret = lib.pmemblk_check(_fsencode(filename), block_size)
     return ret == 1
 
 
+_version_cache = {}
+
+
 def check_version(major_required, minor_required):
     """Checks the libpmemblk version according to the specified major
-    and minor versions required.
+    and minor versions required. Successful checks are cached, so
+    repeated calls with the same versions don't cross into the library
+    again.
 
     :param major_required: Major version required.
     :param minor_required: Minor version required.
     :return: returns True if the nvm has the required version,
           or raises a RuntimeError exception in case of failure.
     """
+    key = (major_required, minor_required)
+    if key in _version_cache:
+        return _version_cache[key]
     ret = lib.pmemblk_check_version(major_required, minor_required)
     if ret != ffi.NULL:
         raise RuntimeError(ffi.string(ret))
+    _version_cache[key] = True
     return True
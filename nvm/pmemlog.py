@@ -7,9 +7,64 @@
 
 .. seealso:: `NVML libpmemlog documentation <http://pmem.io/nvml/libpmemlog/libpmemlog.3.html>`_.
 """
+import itertools
 import os
 from _pmem import lib, ffi
 
+#: Live walk callbacks, keyed by the integer handle smuggled through
+#: the C-side `arg` pointer. The compiled dispatcher below looks the
+#: actual Python callable up here, so no per-walk libffi closure
+#: (an mmap'd executable page) is ever allocated.
+_walk_callbacks = {}
+_walk_handles = itertools.count(1)
+
+# Resolve the pool entry points once at import time; attribute access
+# on the CFFI lib object is a __getattr__ probe, not a dict lookup.
+_pmemlog_append = lib.pmemlog_append
+_pmemlog_tell = lib.pmemlog_tell
+_pmemlog_nbyte = lib.pmemlog_nbyte
+_pmemlog_rewind = lib.pmemlog_rewind
+_pmemlog_close = lib.pmemlog_close
+_pmemlog_appendv = lib.pmemlog_appendv
+_pmemlog_walk = lib.pmemlog_walk
+
+#: Allocator for scratch cdata that is always fully overwritten before
+#: use; skipping the calloc-style zeroing saves a full write pass over
+#: every buffer allocated.
+_raw = ffi.new_allocator(should_clear_after_alloc=False)
+
+try:
+    _posix_fallocate = os.posix_fallocate
+except AttributeError:
+    # Python 2 has no os.posix_fallocate (it appeared in 3.3); reach
+    # the libc call through ctypes so the preallocation in create()
+    # still happens there. None disables the preallocation entirely
+    # where libc doesn't provide the symbol.
+    try:
+        import ctypes
+        import ctypes.util
+
+        _libc = ctypes.CDLL(ctypes.util.find_library('c'))
+        _libc.posix_fallocate.argtypes = [ctypes.c_int,
+                                          ctypes.c_longlong,
+                                          ctypes.c_longlong]
+        _libc.posix_fallocate.restype = ctypes.c_int
+
+        def _posix_fallocate(fd, offset, length):
+            err = _libc.posix_fallocate(fd, offset, length)
+            if err:
+                raise OSError(err, os.strerror(err))
+    except (ImportError, AttributeError, OSError, TypeError):
+        _posix_fallocate = None
+
+
+@ffi.def_extern()
+def pynvm_log_walk_cb(buf, length, arg):
+    func = _walk_callbacks[int(ffi.cast("intptr_t", arg))]
+    # Hand the callback a zero-copy view over the mapped pool; callers
+    # that need an owned copy do bytes(view) themselves.
+    return int(func(ffi.buffer(ffi.cast("char *", buf), length)))
+
 
 class LogPool(object):
     """This class represents the Log Pool opened or created using
@@ -17,15 +72,41 @@ class LogPool(object):
     """
     def __init__(self, log_pool):
         self.log_pool = log_pool
+        # Scratch buffer reused by append_many(), grown geometrically.
+        self._scratch = None
+        self._scratch_len = 0
+        self._closed = False
+        self._nbyte = None
+        # Shadow of the library's write point, maintained on every
+        # successful append so tell() and the capacity guard don't need
+        # an FFI crossing.
+        self._tell_shadow = _pmemlog_tell(log_pool)
 
     def close(self):
         """This method closes the memory pool. The log memory pool itself
         lives on in the file that contains it and may be re-opened at a
-        later time using :func:`~nvm.pmemlog.open()`.
+        later time using :func:`~nvm.pmemlog.open()`. Closing an
+        already-closed pool is a no-op.
         """
-        lib.pmemlog_close(self.log_pool)
+        if not self._closed:
+            self._closed = True
+            self._nbyte = 0
+            _pmemlog_close(self.log_pool)
         return None
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
     def __len__(self):
         return self.nbyte()
 
@@ -34,17 +115,22 @@ class LogPool(object):
         This method may be used to determine how much usable space is
         available after libpmemlog has added its metadata to the memory pool.
 
+        The usable size never changes for an open pool, so the value is
+        queried from the library once and memoized.
+
         .. note:: You can also use `len()` to get the usable space.
 
         :return: amount of usable space in the log pool.
         """
-        ret = lib.pmemlog_nbyte(self.log_pool)
-        return ret
+        if self._nbyte is None:
+            self._nbyte = _pmemlog_nbyte(self.log_pool)
+        return self._nbyte
 
     def rewind(self):
         """This method resets the current write point for the log to zero.
         After this call, the next append adds to the beginning of the log."""
-        lib.pmemlog_rewind(self.log_pool)
+        _pmemlog_rewind(self.log_pool)
+        self._tell_shadow = 0
         return None
 
     def tell(self):
@@ -54,11 +140,14 @@ class LogPool(object):
         by each successful append operation. This function can be used to
         determine how much data is currently in the log.
 
+        The offset is tracked on the Python side across appends and
+        rewinds, so this is a plain attribute read with no library
+        call.
+
         :return: the current write point for the log, expressed as
                  a byte offset.
         """
-        ret = lib.pmemlog_tell(self.log_pool)
-        return ret
+        return self._tell_shadow
 
     def append(self, buf):
         """This method appends from buffer to the current write offset in
@@ -66,10 +155,103 @@ class LogPool(object):
         appending to a file. The append is atomic and cannot be torn
         by a program failure or system crash.
 
-        On success, zero is returned. On error, -1 is returned and errno
-        is set.
+        Any object supporting the buffer protocol (bytes, bytearray,
+        memoryview, numpy arrays) is accepted and passed to the library
+        without copying.
+
+        .. note:: The GIL is released while the library appends and
+                  persists, so threads appending to different pools run
+                  in parallel.
+
+        On success, zero is returned. On error, an exception will be
+        raised; an append that would exceed the log capacity is
+        detected before crossing into the library at all.
+        """
+        if type(buf) is not bytes:
+            buf = ffi.from_buffer(buf)
+        count = len(buf)
+        if (self._tell_shadow + count) > self.nbyte():
+            raise RuntimeError("Append exceeds the log capacity.")
+        ret = _pmemlog_append(self.log_pool, buf, count)
+        if ret == -1:
+            raise RuntimeError(os.strerror(ffi.errno))
+        self._tell_shadow += count
+        return ret
+
+    def append_many(self, bufs):
+        """This method appends a batch of buffers to the log as one
+        contiguous record, issuing a single call into the library. The
+        per-call overhead and the library's persistency barrier are
+        paid once per batch instead of once per buffer, so small-record
+        throughput scales roughly with the batch size. Like
+        :func:`~nvm.pmemlog.LogPool.append`, the combined append is
+        atomic.
+
+        On success, zero is returned. On error, an exception will be
+        raised.
+
+        :param bufs: an iterable of buffers to append back-to-back.
+        """
+        # Materialize first: bufs may be a generator, and it has to
+        # survive both the sizing pass and the pack loop below. Sizes
+        # must be byte counts, and len() of a buffer with itemsize > 1
+        # (e.g. a numpy array) is its element count, so non-bytes
+        # buffers are measured through the char[] view ffi.from_buffer
+        # returns.
+        bufs = [b if type(b) is bytes else ffi.from_buffer(b)
+                for b in bufs]
+        lengths = [len(b) for b in bufs]
+        total = sum(lengths)
+        if (self._tell_shadow + total) > self.nbyte():
+            raise RuntimeError("Append exceeds the log capacity.")
+        if total > self._scratch_len:
+            new_cap = max(total, self._scratch_len * 2)
+            self._scratch = _raw("char[]", new_cap)
+            self._scratch_len = new_cap
+        offset = 0
+        for buf, length in zip(bufs, lengths):
+            ffi.memmove(self._scratch + offset, buf, length)
+            offset += length
+        ret = _pmemlog_append(self.log_pool, self._scratch, total)
+        if ret == -1:
+            raise RuntimeError(os.strerror(ffi.errno))
+        self._tell_shadow += total
+        return ret
+
+    def appendv(self, bufs):
+        """This method appends several buffers to the log through the
+        library's scatter-gather `pmemlog_appendv()`: the buffers are
+        gathered in C under a single atomic commit and a single
+        persistency barrier, without concatenating them in Python
+        first. Buffers are passed zero-copy via the buffer protocol
+        (bytes, bytearray, memoryview, numpy arrays).
+
+        On success, zero is returned. On error, an exception will be
+        raised.
+
+        :param bufs: a sequence of buffers to append back-to-back.
         """
-        ret = lib.pmemlog_append(self.log_pool, buf, len(buf))
+        iov = _raw("struct iovec[]", len(bufs))
+        # Keep the cdata views alive until the call returns; the iovec
+        # entries only borrow their pointers.
+        keepalive = []
+        total = 0
+        for i, buf in enumerate(bufs):
+            cdata = ffi.from_buffer(buf)
+            keepalive.append(cdata)
+            # Sizes are taken from the char[] view, not the source
+            # object: len() of a buffer with itemsize > 1 (e.g. a
+            # numpy array) is its element count, not its byte size.
+            count = len(cdata)
+            iov[i].iov_base = cdata
+            iov[i].iov_len = count
+            total += count
+        if (self._tell_shadow + total) > self.nbyte():
+            raise RuntimeError("Append exceeds the log capacity.")
+        ret = _pmemlog_appendv(self.log_pool, iov, len(bufs))
+        if ret == -1:
+            raise RuntimeError(os.strerror(ffi.errno))
+        self._tell_shadow += total
         return ret
 
     def walk(self, func, chunk_size=0):
@@ -79,36 +261,98 @@ class LogPool(object):
         and may be specified as 0 to cause a single call to the callback
         with the entire log contents.
 
+        The callback receives a zero-copy buffer view over the mapped
+        pool, which is only valid for the duration of the call; use
+        `view[:]` to keep an owned copy, or see
+        :func:`~nvm.pmemlog.LogPool.walk_bytes` for a variant that does
+        the copy for you. Binary records with embedded NUL bytes are
+        passed through unchanged.
+
+        .. note:: The GIL is released while the walk itself runs in the
+                  library and re-acquired for each callback invocation.
+
         :param chunk_size: chunk size or 0 for total length (default to 0).
         :param func: the callback function, should return 1 if it should
                      continue walking through the log, or 0 to terminate
                      the walk.
         """
-        def inner_walk(buf, len, arg):
-            cast_buf = ffi.cast("char *", buf)
-            data = cast_buf[0:len]
-            ret = func(ffi.string(data))
-            return int(ret)
-
-        ffi_func = ffi.callback("int(void *buf, size_t len, void *arg)",
-                                inner_walk)
-        ret = lib.pmemlog_walk(self.log_pool, chunk_size,
-                               ffi_func, ffi.NULL)
+        handle = next(_walk_handles)
+        _walk_callbacks[handle] = func
+        try:
+            ret = _pmemlog_walk(self.log_pool, chunk_size,
+                                lib.pynvm_log_walk_cb,
+                                ffi.cast("void *", handle))
+        finally:
+            del _walk_callbacks[handle]
+        return ret
+
+    def walk_bytes(self, func, chunk_size=0):
+        """Like :func:`~nvm.pmemlog.LogPool.walk`, but each chunk is
+        materialized as an owned bytes copy before the callback sees
+        it, for callers that need to retain chunks past the callback or
+        that predate the zero-copy contract. One allocation and copy
+        per chunk.
+
+        :param chunk_size: chunk size or 0 for total length (default to 0).
+        :param func: the callback function, called with a bytes object;
+                     should return 1 to continue walking or 0 to
+                     terminate the walk.
+        """
+        return self.walk(lambda view: func(view[:]), chunk_size)
+
+    def walk_filtered(self, func, chunk_size, offset, expected):
+        """This function walks through the log pool like
+        :func:`~nvm.pmemlog.LogPool.walk`, but evaluates a header
+        predicate in C and only calls back into Python for matching
+        chunks: a chunk matches when the native-endian 32-bit word at
+        byte `offset` equals `expected`. For selective scans over logs
+        of fixed-length records this cuts the Python call count by the
+        filter's selectivity ratio.
+
+        :param func: the callback function, called with matching chunks
+                     only; same contract as
+                     :func:`~nvm.pmemlog.LogPool.walk`.
+        :param chunk_size: the fixed record size to walk with.
+        :param offset: byte offset of the 32-bit header word to test.
+        :param expected: value the header word must equal.
+        """
+        handle = next(_walk_handles)
+        _walk_callbacks[handle] = func
+        desc = _raw("struct pynvm_walk_filter_desc *")
+        desc.offset = offset
+        desc.expected = expected
+        desc.arg = ffi.cast("void *", handle)
+        try:
+            ret = _pmemlog_walk(self.log_pool, chunk_size,
+                                lib.pynvm_walk_filter, desc)
+        finally:
+            del _walk_callbacks[handle]
         return ret
 
 
+_version_cache = {}
+
+
 def check_version(major_required, minor_required):
     """Checks the libpmemlog version according to the specified major
-    and minor versions required.
+    and minor versions required. Successful checks are cached, so
+    repeated calls with the same versions don't cross into the library
+    again.
 
     :param major_required: Major version required.
     :param minor_required: Minor version required.
     :return: returns True if the nvm has the required version,
           or raises a RuntimeError exception in case of failure.
     """
+    key = (major_required, minor_required)
+    if key in _version_cache:
+        return _version_cache[key]
     ret = lib.pmemlog_check_version(major_required, minor_required)
-    if ret != ffi.NULL:
-        raise RuntimeError(ffi.string(ret))
+    if ret:
+        # The strlen scan and decode only happen on the error branch;
+        # a successful check stays allocation-free.
+        raise RuntimeError(ffi.string(ret).decode('ascii', 'replace'))
+    _version_cache[key] = True
     return True
 
 
@@ -140,8 +384,9 @@ def open(filename):
     :rtype: LogPool
     """
     ret = lib.pmemlog_open(filename)
-    if ret == ffi.NULL:
-        raise RuntimeError(os.strerror(ffi.errno))
+    if not ret:
+        err = ffi.errno
+        raise RuntimeError(os.strerror(err))
     return LogPool(ret)
 
 
@@ -161,7 +406,34 @@ def create(filename, pool_size=1024 * 1024 * 2, mode=0666):
     :return: the new log memory pool created.
     :rtype: LogPool
     """
+    # Preallocate the pool file up front where the platform supports
+    # it, so the first burst of appends doesn't pay block allocation
+    # and metadata-journal cost on every page fault. The library then
+    # adopts the already-sized file (pool size zero). When the file
+    # already exists we fall through and let pmemlog_create fail as
+    # before.
+    preallocated = False
+    if _posix_fallocate is not None and not os.path.exists(filename):
+        fd = os.open(filename, os.O_CREAT | os.O_RDWR | os.O_EXCL, mode)
+        try:
+            _posix_fallocate(fd, 0, pool_size)
+        except Exception:
+            os.close(fd)
+            os.unlink(filename)
+            raise
+        os.close(fd)
+        pool_size = 0
+        preallocated = True
+
     ret = lib.pmemlog_create(filename, pool_size, mode)
-    if ret == ffi.NULL:
-        raise RuntimeError(os.strerror(ffi.errno))
+    if not ret:
+        err = ffi.errno
+        # Don't leave the preallocated file behind on failure; a stale
+        # file would make every retry fail with EEXIST.
+        if preallocated:
+            try:
+                os.unlink(filename)
+            except OSError:
+                pass
+        raise RuntimeError(os.strerror(err))
     return LogPool(ret)
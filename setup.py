@@ -1,20 +1,39 @@
+import re
+
 from setuptools import setup
-import nvm
 
+
+def _read_version_info():
+    # Parse the metadata out of nvm/_version.py instead of importing
+    # the package, which would load the compiled CFFI extension (and
+    # therefore require libpmem) at build time.
+    with open('nvm/_version.py') as version_file:
+        source = version_file.read()
+    author = re.search(r"__author__ = '([^']+)'", source).group(1)
+    version = re.search(r"__version__ = '([^']+)'", source).group(1)
+    return author, version
+
+
+_author, _version = _read_version_info()
+
+# cffi 1.10 is the floor: the wrappers call ffi.from_buffer() on
+# bytes (accepted since 1.8) and bytearray (1.10), and also rely on
+# extern "Python" callbacks (1.4), ffi.memmove (1.3) and
+# ffi.new_allocator (1.2).
 install_requirements = ['nose>=1.3.7',
-                        'cffi>=1.0.0']
+                        'cffi>=1.10']
 
-setup_requirements = ['cffi>=1.0.0',
+setup_requirements = ['cffi>=1.10',
                       'nose>=1.3.1',
                       'coveralls>=1.1',
                       'mock']
 
 setup(
     name='pynvm',
-    version=nvm.__version__,
+    version=_version,
     url='https://github.com/perone/pynvm',
     license='BSD 3-clause',
-    author=nvm.__author__,
+    author=_author,
     author_email='christian.perone@gmail.com',
     description='Next-generation non-volatile memory for Python.',
     long_description='Next-generation non-volatile memory for Python.',
@@ -1,14 +1,44 @@
+import itertools
 import unittest
 import os
-import uuid
+import shutil
+import tempfile
 
 from nvm import pmem
 
+#: Directory holding every throwaway pool file; placed on tmpfs when
+#: available so test setup doesn't touch a real disk.
+_BASE_DIR = None
+
+#: Monotonic counter for pool filenames; combined with the pid it keeps
+#: parallel test runs collision-free without a syscall per test.
+_ids = itertools.count()
+
+#: Payload larger than the smallest mapping used by the range tests,
+#: built once instead of per test run.
+_OVERFLOW_PAYLOAD = b'0' * 256
+
+
+def _pool_filename():
+    return os.path.join(_BASE_DIR, "pynvm_test_{}_{}.pmem".format(
+        os.getpid(), next(_ids)))
+
+
+def setUpModule():
+    global _BASE_DIR
+    shm = '/dev/shm'
+    _BASE_DIR = tempfile.mkdtemp(prefix='pynvm_test_',
+                                 dir=shm if os.path.isdir(shm) else None)
+
+
+def tearDownModule():
+    shutil.rmtree(_BASE_DIR, ignore_errors=True)
+
 
 class MapMixin(object):
 
     def create_mapping(self, size=4096):
-        filename = "{}.pmem".format(uuid.uuid4())
+        filename = _pool_filename()
         mapping = pmem.map_file(filename, size,
                                 pmem.FILE_CREATE | pmem.FILE_EXCL,
                                 0666)
@@ -55,10 +85,36 @@ class TestMemoryBuffer(unittest.TestCase, MapMixin):
         self.assertEqual(mapping.read(test_len), test_str)
         self.clear_mapping(filename, mapping)
 
+    def test_write_persist(self):
+        filename, mapping = self.create_mapping()
+        test_str = "testing"
+        test_len = len(test_str)
+        mapping.write_persist(test_str)
+        mapping.seek(0)
+        self.assertEqual(mapping.read(test_len), test_str)
+        self.clear_mapping(filename, mapping)
+
+    def test_read_view(self):
+        filename, mapping = self.create_mapping()
+        test_str = "testing"
+        test_len = len(test_str)
+        mapping.write(test_str)
+        mapping.seek(0)
+        view = mapping.read_view(test_len)
+        self.assertEqual(view.tobytes(), test_str)
+        self.assertEqual(mapping.pos, test_len)
+        self.clear_mapping(filename, mapping)
+
+    def test_memset(self):
+        filename, mapping = self.create_mapping()
+        mapping.memset(0, 0, 16)
+        self.assertEqual(mapping.read(16), "\x00" * 16)
+        self.clear_mapping(filename, mapping)
+
     def test_write_out_range(self):
         filename, mapping = self.create_mapping(128)
         with self.assertRaises(RuntimeError):
-            mapping.write('0' * 256)
+            mapping.write(_OVERFLOW_PAYLOAD)
         self.clear_mapping(filename, mapping)
 
 
@@ -76,6 +132,28 @@ class TestPersist(unittest.TestCase, MapMixin):
         self.clear_mapping(filename, mapping)
 
 
+class TestPersistRange(unittest.TestCase, MapMixin):
+    def test_persist_range(self):
+        filename, mapping = self.create_mapping()
+        mapping.write("testing")
+        pmem.persist_range(mapping, 0, 7)
+        self.clear_mapping(filename, mapping)
+
+    def test_flush_range(self):
+        filename, mapping = self.create_mapping()
+        mapping.write("testing")
+        pmem.flush_range(mapping, 0, 7)
+        self.clear_mapping(filename, mapping)
+
+    def test_persist_range_out_of_range(self):
+        filename, mapping = self.create_mapping(128)
+        with self.assertRaises(RuntimeError):
+            pmem.persist_range(mapping, 64, 128)
+        with self.assertRaises(RuntimeError):
+            pmem.persist_range(mapping, -1, 8)
+        self.clear_mapping(filename, mapping)
+
+
 class TestMsync(unittest.TestCase, MapMixin):
     def test_msync(self):
         filename, mapping = self.create_mapping()
@@ -91,6 +169,13 @@ class TestFlush(unittest.TestCase, MapMixin):
         self.clear_mapping(filename, mapping)
 
 
+class TestFlushDrain(unittest.TestCase, MapMixin):
+    def test_flush_drain(self):
+        filename, mapping = self.create_mapping()
+        pmem.flush_drain(mapping)
+        self.clear_mapping(filename, mapping)
+
+
 class TestHwDrain(unittest.TestCase, MapMixin):
     def test_hw_drain(self):
         filename, mapping = self.create_mapping()
@@ -98,9 +183,26 @@ class TestHwDrain(unittest.TestCase, MapMixin):
         self.clear_mapping(filename, mapping)
 
 
+class TestBatch(unittest.TestCase, MapMixin):
+    def test_batch(self):
+        filename, mapping = self.create_mapping()
+        with mapping.batch():
+            mapping.write_buffered("test")
+            mapping.write_buffered("test")
+        mapping.seek(0)
+        self.assertEqual(mapping.read(8), "testtest")
+        self.clear_mapping(filename, mapping)
+
+    def test_flush_pending(self):
+        filename, mapping = self.create_mapping()
+        mapping.write_buffered("test")
+        mapping.flush_pending()
+        self.clear_mapping(filename, mapping)
+
+
 class TestMapContext(unittest.TestCase):
     def test_map_context(self):
-        filename = "{}.pmem".format(uuid.uuid4())
+        filename = _pool_filename()
         with pmem.map_file(filename, 4096,
                            pmem.FILE_CREATE | pmem.FILE_EXCL,
                            0666) as reg: